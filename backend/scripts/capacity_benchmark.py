@@ -0,0 +1,209 @@
+"""Find how many concurrent sessions one CPU core can sustain.
+
+Runs N sessions in one process, each an `AgentSession` built by
+`agent.create_session` exactly like `entrypoint` does: the silero VAD from
+`prewarm`, the turn detector, the STT stream adapter, sentence tokenizer and
+text pacing. STT, LLM and TTS are the stubs from `replay_benchmark.py`, so no
+network is used. Every session replays the WAV fixtures in a loop, one
+utterance every `--turn-interval` seconds, with silence in between. N is
+ramped until event-loop lag exceeds the budget or the process saturates its
+core. The process's idle CPU, measured before any session starts, is
+subtracted before dividing by the session count.
+
+BVC noise cancellation runs on room audio, which these sessions don't have,
+so the per-session CPU it reports is still a lower bound.
+
+Download the VAD and turn-detector models once first
+(`uv run python src/agent.py download-files`), then pin the process to a
+single core so the result reads as sessions per core:
+
+    taskset -c 0 uv run python scripts/capacity_benchmark.py path/to/fixtures
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import types
+from pathlib import Path
+
+import psutil
+from livekit.agents import tts
+from replay_benchmark import (
+    LocalInferenceExecutor,
+    ReplayLLM,
+    ReplaySTT,
+    ReplayTTS,
+    ReplayTurnDetector,
+    TimingAudioOutput,
+    WavAudioInput,
+    push_realtime,
+    read_frames,
+    silence_frames,
+)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent import Assistant, create_sentence_tokenizer, create_session, prewarm
+from worker_load import LoopLagMonitor
+
+
+def _load_fixtures(path: Path, default_transcript: str):
+    fixtures = sorted(path.glob("*.wav")) if path.is_dir() else [path]
+    if not fixtures:
+        raise SystemExit(f"No WAV fixtures found in {path}")
+    utterances = []
+    for wav in fixtures:
+        transcript = wav.with_suffix(".txt")
+        text = transcript.read_text().strip() if transcript.exists() else default_transcript
+        utterances.append((read_frames(wav), text))
+    rates = {frames[0].sample_rate for frames, _ in utterances}
+    if len(rates) > 1:
+        raise SystemExit(f"Fixtures must share one sample rate, got {sorted(rates)}")
+    return utterances
+
+
+async def _session(userdata: dict, utterances, args, offset: int, total: int, replies: list) -> None:
+    replay_stt = ReplaySTT(args.stt_ms / 1000)
+    session = create_session(
+        stt=replay_stt,
+        llm=ReplayLLM(args.llm_ttft_ms / 1000, args.llm_token_ms / 1000, args.notion_ms / 1000, args.reply),
+        tts=tts.StreamAdapter(
+            tts=ReplayTTS(args.tts_ttfb_ms / 1000),
+            sentence_tokenizer=create_sentence_tokenizer(),
+            text_pacing=True,
+        ),
+        vad=userdata["vad"],
+        turn_detection=userdata["turn_detection"],
+        # The stub output can't pause, the session would only warn about it
+        resume_false_interruption=False,
+    )
+    audio_input = WavAudioInput()
+    session.input.audio = audio_input
+    session.output.audio = TimingAudioOutput(replies.append)
+    await session.start(agent=Assistant())
+
+    sample_rate = utterances[0][0][0].sample_rate
+    # Stagger sessions so their turns don't all line up
+    await push_realtime(audio_input, silence_frames(sample_rate, args.turn_interval * offset / total))
+    i = offset
+    try:
+        while True:
+            frames, text = utterances[i % len(utterances)]
+            i += 1
+            replay_stt.transcripts.put_nowait(text)
+            await push_realtime(audio_input, frames)
+            # Silence as a live mic would send it, while the agent replies
+            await push_realtime(audio_input, silence_frames(sample_rate, args.turn_interval))
+    finally:
+        await session.aclose()
+
+
+async def _cpu_cores(seconds: float) -> float:
+    proc = psutil.Process()
+    proc.cpu_percent(interval=None)
+    await asyncio.sleep(seconds)
+    return proc.cpu_percent(interval=None) / 100
+
+
+async def _run_step(userdata: dict, utterances, sessions: int, args) -> dict:
+    monitor = LoopLagMonitor(interval=0.05, keep_samples=True)
+    replies = []
+    tasks = [
+        asyncio.create_task(_session(userdata, utterances, args, offset, sessions, replies))
+        for offset in range(sessions)
+    ]
+    # Let the sessions settle before measuring
+    await asyncio.sleep(args.warmup)
+    monitor.start()
+    replied_before = len(replies)
+    cpu_cores = await _cpu_cores(args.duration)
+    replied = len(replies) - replied_before
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await monitor.aclose()
+
+    lags = monitor.samples
+    p95 = statistics.quantiles(lags, n=20, method="inclusive")[-1] if len(lags) >= 2 else 0.0
+    return {"sessions": sessions, "cpu_cores": cpu_cores, "lag_p95": p95, "replies": replied}
+
+
+async def main(args) -> None:
+    utterances = _load_fixtures(args.fixtures, args.default_transcript)
+    proc = types.SimpleNamespace(userdata={})
+    prewarm(proc)
+    if args.turn_detection == "multilingual":
+        executor = LocalInferenceExecutor()
+        proc.userdata["turn_detection"] = ReplayTurnDetector(executor)
+        executor.load(proc.userdata["turn_detection"]._inference_method())
+    else:
+        proc.userdata["turn_detection"] = "vad"
+
+    idle = await _cpu_cores(args.baseline)
+    print(f"idle={idle:.3f} cores")
+
+    best = None
+    capped = False
+    sessions = args.start
+    while sessions <= args.max_sessions:
+        result = await _run_step(proc.userdata, utterances, sessions, args)
+        ok = result["lag_p95"] <= args.max_lag and result["cpu_cores"] <= args.cpu_budget
+        print(
+            f"sessions={sessions:3d} cpu={result['cpu_cores']:.2f} cores "
+            f"lag_p95={result['lag_p95'] * 1000:.1f}ms replies={result['replies']} "
+            f"{'ok' if ok else 'over budget'}"
+        )
+        if not ok:
+            break
+        best = result
+        sessions += args.step
+    else:
+        capped = True
+
+    if best is None:
+        print("Even the first step exceeded the budget")
+        return
+    per_session = max(best["cpu_cores"] - idle, 0.0) / best["sessions"]
+    per_core = 1 / per_session if per_session else float("inf")
+    if capped:
+        print(
+            f"Stopped at --max-sessions ({args.max_sessions}) without exceeding the budget, "
+            "raise it to find the real limit"
+        )
+    else:
+        print(f"Max sustainable sessions: {best['sessions']}")
+    print(f"Measured: ~{per_core:.1f} sessions per core, {per_session:.3f} cores/session above idle")
+    excluded = "BVC" if args.turn_detection == "multilingual" else "turn-detector inference and BVC"
+    print(
+        f"Lower bound for SESSION_CPU_CORES: {per_session:.3f} "
+        f"(excludes {excluded}; keep the default unless you measure higher)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", type=Path, help="WAV file or directory of WAV files")
+    parser.add_argument(
+        "--turn-detection",
+        choices=["multilingual", "vad"],
+        default="multilingual",
+        help="'vad' skips the turn-detector model",
+    )
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--max-sessions", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per step")
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--baseline", type=float, default=3.0, help="seconds of idle CPU measured first")
+    parser.add_argument("--max-lag", type=float, default=0.05, help="p95 event-loop lag budget (s)")
+    parser.add_argument("--cpu-budget", type=float, default=0.9, help="cores the process may use")
+    parser.add_argument("--turn-interval", type=float, default=5.0, help="seconds of silence after each utterance")
+    parser.add_argument("--stt-ms", type=float, default=150)
+    parser.add_argument("--llm-ttft-ms", type=float, default=400)
+    parser.add_argument("--llm-token-ms", type=float, default=15)
+    parser.add_argument("--notion-ms", type=float, default=300, help="tool round trip per reply")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=200)
+    parser.add_argument("--reply", default="Thanks for sharing that. How is your energy level today?")
+    parser.add_argument("--default-transcript", default="I'm feeling a bit tired today.")
+    asyncio.run(main(parser.parse_args()))
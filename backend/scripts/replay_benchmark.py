@@ -0,0 +1,359 @@
+"""Replay recorded utterances through the voice pipeline and time each reply.
+
+The session is built by `agent.create_session`, the same call `entrypoint`
+makes. It uses the real silero VAD from `prewarm` and the MultilingualModel
+turn detector. STT, LLM and TTS are stubs with configurable latencies, so no
+network is used. For every utterance the report shows how long it took from the
+end of the user's speech to the first agent audio frame.
+
+Fixtures are 16-bit PCM mono WAV files at one shared sample rate, trimmed so
+the speech runs to the end of the file. An optional `<name>.txt` next to each WAV holds the transcript
+the stub STT returns, which is what the turn detector scores.
+
+Download the VAD and turn-detector models once first
+(`uv run python src/agent.py download-files`), then:
+
+    uv run python scripts/replay_benchmark.py path/to/fixtures --min-endpointing 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import statistics
+import sys
+import time
+import types
+import uuid
+import wave
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    APIConnectOptions,
+    llm,
+    stt,
+    tts,
+)
+from livekit.agents.inference_runner import _InferenceRunner
+from livekit.agents.voice import io
+from livekit.plugins.turn_detector.base import EOUModelBase
+from livekit.plugins.turn_detector.multilingual import MultilingualModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from agent import Assistant, create_sentence_tokenizer, create_session, prewarm
+
+FRAME_MS = 10
+TTS_SAMPLE_RATE = 24000
+
+
+@dataclass
+class Turn:
+    fixture: str
+    speech_end: float
+    vad_end: float | None = None
+    first_audio: float | None = None
+
+    @property
+    def latency(self) -> float | None:
+        if self.first_audio is None:
+            return None
+        return self.first_audio - self.speech_end
+
+
+class LocalInferenceExecutor:
+    """Runs inference runners in a thread, standing in for the worker's inference process"""
+
+    def __init__(self) -> None:
+        self._runners = {}
+
+    def load(self, method: str) -> None:
+        runner = _InferenceRunner.registered_runners[method]()
+        runner.initialize()
+        self._runners[method] = runner
+
+    async def do_inference(self, method: str, data: bytes) -> bytes | None:
+        return await asyncio.to_thread(self._runners[method].run, data)
+
+
+class ReplayTurnDetector(MultilingualModel):
+    def __init__(self, executor: LocalInferenceExecutor) -> None:
+        # MultilingualModel looks the executor up on the job context, there is none here
+        EOUModelBase.__init__(self, model_type="multilingual", inference_executor=executor)
+
+
+class ReplaySTT(stt.STT):
+    """Returns the fixture transcripts in order after a fixed delay"""
+
+    def __init__(self, latency: float) -> None:
+        super().__init__(capabilities=stt.STTCapabilities(streaming=False, interim_results=False))
+        self._latency = latency
+        self.transcripts = asyncio.Queue()
+
+    async def _recognize_impl(self, buffer, *, language=None, conn_options=DEFAULT_API_CONNECT_OPTIONS):
+        await asyncio.sleep(self._latency)
+        text = self.transcripts.get_nowait() if not self.transcripts.empty() else ""
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            alternatives=[stt.SpeechData(language="en", text=text)],
+        )
+
+
+class ReplayLLM(llm.LLM):
+    def __init__(self, ttft: float, token_interval: float, tool_latency: float, reply: str) -> None:
+        super().__init__()
+        self.ttft = ttft
+        self.token_interval = token_interval
+        self.tool_latency = tool_latency
+        self.reply = reply
+
+    def chat(self, *, chat_ctx, tools=None, conn_options=DEFAULT_API_CONNECT_OPTIONS, **kwargs):
+        return _ReplayLLMStream(self, chat_ctx=chat_ctx, tools=tools or [], conn_options=conn_options)
+
+
+class _ReplayLLMStream(llm.LLMStream):
+    async def _run(self) -> None:
+        replay = self._llm
+        await asyncio.sleep(replay.ttft)
+        if replay.tool_latency:
+            # A tool round trip: the tool itself, then a second request to the LLM
+            await asyncio.sleep(replay.tool_latency + replay.ttft)
+        request_id = str(uuid.uuid4())
+        for i, word in enumerate(replay.reply.split(" ")):
+            if i:
+                await asyncio.sleep(replay.token_interval)
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    id=request_id,
+                    delta=llm.ChoiceDelta(role="assistant", content=word if i == 0 else f" {word}"),
+                )
+            )
+
+
+class ReplayTTS(tts.TTS):
+    def __init__(self, ttfb: float) -> None:
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1,
+        )
+        self.ttfb = ttfb
+
+    def synthesize(self, text: str, *, conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS):
+        return _ReplayChunkedStream(tts=self, input_text=text, conn_options=conn_options)
+
+
+class _ReplayChunkedStream(tts.ChunkedStream):
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        await asyncio.sleep(self._tts.ttfb)
+        output_emitter.initialize(
+            request_id=str(uuid.uuid4()),
+            sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        # ~60ms of silence per character, roughly the pace of speech
+        samples = int(TTS_SAMPLE_RATE * 0.06 * max(len(self._input_text), 1))
+        output_emitter.push(b"\x00\x00" * samples)
+
+
+class WavAudioInput(io.AudioInput):
+    def __init__(self) -> None:
+        super().__init__(label="replay")
+        self.frames = asyncio.Queue()
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        return await self.frames.get()
+
+
+class TimingAudioOutput(io.AudioOutput):
+    """Records when the first frame of each reply arrives, then plays back instantly"""
+
+    def __init__(self, on_first_frame) -> None:
+        super().__init__(label="replay", capabilities=io.AudioOutputCapabilities(pause=False))
+        self._on_first_frame = on_first_frame
+        self._pushed = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._pushed == 0.0:
+            self._on_first_frame(time.perf_counter())
+        self._pushed += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        self._finish(interrupted=False)
+
+    def clear_buffer(self) -> None:
+        self._finish(interrupted=True)
+
+    def _finish(self, interrupted: bool) -> None:
+        if self._pushed:
+            self.on_playback_finished(playback_position=self._pushed, interrupted=interrupted)
+        self._pushed = 0.0
+
+
+def read_frames(path: Path) -> list[rtc.AudioFrame]:
+    with wave.open(str(path), "rb") as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != 1:
+            raise ValueError(f"{path}: expected 16-bit mono PCM")
+        sample_rate = wav.getframerate()
+        pcm = wav.readframes(wav.getnframes())
+    if not pcm:
+        raise ValueError(f"{path}: no audio frames")
+
+    samples = sample_rate * FRAME_MS // 1000
+    step = samples * 2
+    return [
+        rtc.AudioFrame(
+            data=pcm[i : i + step].ljust(step, b"\x00"),
+            sample_rate=sample_rate,
+            num_channels=1,
+            samples_per_channel=samples,
+        )
+        for i in range(0, len(pcm), step)
+    ]
+
+
+async def push_realtime(audio_input: WavAudioInput, frames: list[rtc.AudioFrame]) -> None:
+    loop = asyncio.get_running_loop()
+    next_at = loop.time()
+    for frame in frames:
+        audio_input.frames.put_nowait(frame)
+        next_at += FRAME_MS / 1000
+        await asyncio.sleep(max(0.0, next_at - loop.time()))
+
+
+def silence_frames(sample_rate: int, seconds: float) -> list[rtc.AudioFrame]:
+    samples = sample_rate * FRAME_MS // 1000
+    frame = rtc.AudioFrame(
+        data=b"\x00\x00" * samples,
+        sample_rate=sample_rate,
+        num_channels=1,
+        samples_per_channel=samples,
+    )
+    return [frame] * int(seconds * 1000 / FRAME_MS)
+
+
+async def replay(args) -> list[Turn]:
+    fixtures = sorted(args.fixtures.glob("*.wav")) if args.fixtures.is_dir() else [args.fixtures]
+    if not fixtures:
+        raise SystemExit(f"No WAV fixtures found in {args.fixtures}")
+    # Every fixture feeds the same VAD stream, which rejects a change of sample rate
+    audio = {path: read_frames(path) for path in fixtures}
+    rates = {path.name: frames[0].sample_rate for path, frames in audio.items()}
+    if len(set(rates.values())) > 1:
+        raise SystemExit(f"Fixtures must share one sample rate, got {rates}")
+    sample_rate = next(iter(rates.values()))
+
+    proc = types.SimpleNamespace(userdata={})
+    prewarm(proc)
+    if args.turn_detection == "multilingual":
+        executor = LocalInferenceExecutor()
+        turn_detection = ReplayTurnDetector(executor)
+        # Load the model up front so the first turn doesn't pay for it
+        executor.load(turn_detection._inference_method())
+    else:
+        turn_detection = "vad"
+
+    replay_stt = ReplaySTT(args.stt_ms / 1000)
+    session = create_session(
+        stt=replay_stt,
+        llm=ReplayLLM(args.llm_ttft_ms / 1000, args.llm_token_ms / 1000, args.tool_ms / 1000, args.reply),
+        tts=tts.StreamAdapter(
+            tts=ReplayTTS(args.tts_ttfb_ms / 1000),
+            sentence_tokenizer=create_sentence_tokenizer(),
+            text_pacing=True,
+        ),
+        vad=proc.userdata["vad"],
+        turn_detection=turn_detection,
+        min_endpointing_delay=args.min_endpointing,
+        max_endpointing_delay=args.max_endpointing,
+    )
+
+    turns: list[Turn] = []
+    replied = asyncio.Event()
+
+    def _on_first_frame(at: float) -> None:
+        if turns and turns[-1].first_audio is None:
+            turns[-1].first_audio = at
+            replied.set()
+
+    @session.on("user_state_changed")
+    def _on_user_state(ev) -> None:
+        if ev.old_state == "speaking" and ev.new_state == "listening" and turns:
+            turns[-1].vad_end = time.perf_counter()
+
+    audio_input = WavAudioInput()
+    session.input.audio = audio_input
+    session.output.audio = TimingAudioOutput(_on_first_frame)
+    await session.start(agent=Assistant())
+
+    for path in fixtures:
+        transcript = path.with_suffix(".txt")
+        replay_stt.transcripts.put_nowait(
+            transcript.read_text().strip() if transcript.exists() else args.default_transcript
+        )
+        frames = audio[path]
+        replied.clear()
+        turns.append(Turn(fixture=path.name, speech_end=0.0))
+        await push_realtime(audio_input, frames)
+        turns[-1].speech_end = time.perf_counter()
+
+        # Keep feeding silence, as a live mic would, until the agent answers
+        silence = silence_frames(sample_rate, args.timeout)
+        feeder = asyncio.create_task(push_realtime(audio_input, silence))
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(replied.wait(), timeout=args.timeout)
+        # Let the reply finish before the next utterance so it isn't an interruption
+        await asyncio.sleep(args.gap)
+        feeder.cancel()
+
+    await session.aclose()
+    return turns
+
+
+def report(turns: list[Turn], as_json: bool) -> None:
+    if as_json:
+        print(json.dumps([{**asdict(t), "latency": t.latency} for t in turns], indent=2))
+        return
+
+    for t in turns:
+        vad = f"{(t.vad_end - t.speech_end) * 1000:7.0f}ms" if t.vad_end else "      -  "
+        latency = f"{t.latency * 1000:7.0f}ms" if t.latency is not None else "no reply"
+        print(f"{t.fixture:40s} vad_end {vad}  first_audio {latency}")
+
+    latencies = sorted(t.latency for t in turns if t.latency is not None)
+    if len(latencies) >= 2:
+        p95 = statistics.quantiles(latencies, n=20, method="inclusive")[-1]
+        print(f"\nturns={len(latencies)} p50={statistics.median(latencies) * 1000:.0f}ms p95={p95 * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("fixtures", type=Path, help="WAV file or directory of WAV files")
+    parser.add_argument(
+        "--turn-detection",
+        choices=["multilingual", "vad"],
+        default="multilingual",
+        help="'vad' gives a baseline without the turn-detector model",
+    )
+    parser.add_argument("--min-endpointing", type=float, default=0.5)
+    parser.add_argument("--max-endpointing", type=float, default=3.0)
+    parser.add_argument("--stt-ms", type=float, default=150, help="final transcript delay after VAD end of speech")
+    parser.add_argument("--llm-ttft-ms", type=float, default=400)
+    parser.add_argument("--llm-token-ms", type=float, default=15)
+    parser.add_argument("--tool-ms", type=float, default=0, help="simulate a tool call round trip per reply")
+    parser.add_argument("--tts-ttfb-ms", type=float, default=200)
+    parser.add_argument("--reply", default="Thanks for sharing that. How is your energy level today?")
+    parser.add_argument("--default-transcript", default="I'm feeling a bit tired today.")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for a reply")
+    parser.add_argument("--gap", type=float, default=1.0, help="silence after each reply")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+    report(asyncio.run(replay(args)), args.json)
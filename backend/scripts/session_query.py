@@ -0,0 +1,116 @@
+"""Aggregate exported sessions (see SESSION_EXPORT_DIR) with vectorized Arrow scans.
+
+Only the needed columns are read, and date filters prune whole partitions
+before any file is opened.
+
+    uv run python scripts/session_query.py exports mood-trend --by week
+    uv run python scripts/session_query.py exports --since 2025-01-01 tool-latency
+    uv run python scripts/session_query.py exports compact --date 2025-01-31
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from session_export import TABLES, compact_partition, open_dataset
+
+
+def _date_filter(args):
+    expr = None
+    if args.since:
+        expr = ds.field("date") >= args.since
+    if args.until:
+        until = ds.field("date") <= args.until
+        expr = until if expr is None else expr & until
+    return expr
+
+
+def mood_trend(args) -> None:
+    table = open_dataset(args.root, "checkins").to_table(
+        columns=["ts", "mood"], filter=_date_filter(args)
+    )
+    if table.num_rows == 0:
+        print("No check-ins found")
+        return
+
+    counts = (
+        pa.table({
+            "period": pc.floor_temporal(table["ts"], 1, args.by),
+            "mood": pc.utf8_lower(pc.utf8_trim_whitespace(table["mood"])),
+        })
+        .group_by(["period", "mood"])
+        .aggregate([("mood", "count")])
+        .sort_by([("period", "ascending"), ("mood_count", "descending")])
+    )
+
+    current = None
+    shown = 0
+    for row in counts.to_pylist():
+        if row["period"] != current:
+            current = row["period"]
+            shown = 0
+            print(f"\n{current:%Y-%m-%d}")
+        if shown < args.top:
+            print(f"  {row['mood_count']:8d}  {row['mood']}")
+            shown += 1
+
+
+def tool_latency(args) -> None:
+    table = open_dataset(args.root, "tool_calls").to_table(
+        columns=["name", "latency_s", "is_error"], filter=_date_filter(args)
+    )
+    if table.num_rows == 0:
+        print("No tool calls found")
+        return
+
+    stats = table.group_by("name").aggregate([
+        ("latency_s", "count"),
+        ("latency_s", "mean"),
+        ("latency_s", "tdigest", pc.TDigestOptions(q=[0.5, 0.95, 0.99])),
+        ("is_error", "sum"),
+    ]).sort_by([("latency_s_count", "descending")])
+
+    print(f"{'tool':24s} {'calls':>9s} {'mean':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'errors':>7s}")
+    for row in stats.to_pylist():
+        p50, p95, p99 = (q * 1000 if q is not None else float("nan") for q in row["latency_s_tdigest"])
+        mean = (row["latency_s_mean"] or 0.0) * 1000
+        print(
+            f"{row['name']:24s} {row['latency_s_count']:9d} {mean:7.0f}ms "
+            f"{p50:6.0f}ms {p95:6.0f}ms {p99:6.0f}ms {row['is_error_sum'] or 0:7d}"
+        )
+
+
+def compact(args) -> None:
+    for table in args.tables:
+        path = compact_partition(args.root, table, args.date)
+        print(f"{table}: {path or 'nothing to compact'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", type=Path, help="SESSION_EXPORT_DIR")
+    parser.add_argument("--since", help="first date (YYYY-MM-DD) to include")
+    parser.add_argument("--until", help="last date (YYYY-MM-DD) to include")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    mood = commands.add_parser("mood-trend", help="most reported moods per day or week")
+    mood.add_argument("--by", choices=["day", "week", "month"], default="day")
+    mood.add_argument("--top", type=int, default=5)
+    mood.set_defaults(func=mood_trend)
+
+    latency = commands.add_parser("tool-latency", help="latency distribution per tool")
+    latency.set_defaults(func=tool_latency)
+
+    merge = commands.add_parser("compact", help="merge a finished day's per-session files")
+    merge.add_argument("--date", required=True)
+    merge.add_argument("--tables", nargs="+", choices=TABLES, default=list(TABLES))
+    merge.set_defaults(func=compact)
+
+    args = parser.parse_args()
+    args.func(args)
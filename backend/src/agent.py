@@ -1,6 +1,8 @@
+import asyncio
 import logging
 import json
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 import aiohttp
@@ -23,6 +25,11 @@ from livekit.agents import (
 from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+from session_export import SessionRecorder
+from structured_logging import Sampler, setup_structured_logging
+from tool_cache import ToolCache, invalidates, memoize
+from worker_load import LoopLagMonitor, WorkerLoad, idle_process_count
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
@@ -38,6 +45,33 @@ NOTION_TODO_DB_ID = os.getenv("NOTION_TODO_DB_ID", "")
 NOTION_API_URL = "https://api.notion.com/v1"
 NOTION_VERSION = "2022-06-28"
 
+# How long (seconds) read-only tool results are reused within a session
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "30"))
+
+# Logging: LOG_FORMAT=json writes batched JSON lines from a background thread.
+# LOG_METRICS_EVERY=N (opt-in) logs only every N-th metrics event of each type
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_METRICS_EVERY = int(os.getenv("LOG_METRICS_EVERY", "1"))
+
+log_handler = setup_structured_logging(logger) if LOG_FORMAT == "json" else None
+
+# Directory for per-session Parquet exports (transcript, tool calls, metrics,
+# check-ins); unset disables the export. Query with scripts/session_query.py
+SESSION_EXPORT_DIR = os.getenv("SESSION_EXPORT_DIR", "")
+
+# Worker capacity (see worker_load.py); 0 means derive from measurements
+WORKER_LOAD_THRESHOLD = float(os.getenv("WORKER_LOAD_THRESHOLD", "0.75"))
+WORKER_MAX_SESSIONS = int(os.getenv("WORKER_MAX_SESSIONS", "0"))
+WORKER_CPU_CORES = float(os.getenv("WORKER_CPU_CORES", "0"))
+WORKER_MEMORY_BUDGET_MB = float(os.getenv("WORKER_MEMORY_BUDGET_MB", "0"))
+WORKER_MAX_LOOP_LAG = float(os.getenv("WORKER_MAX_LOOP_LAG", "0.1"))
+# Starting per-session cost estimates, refined from measurements at runtime
+SESSION_CPU_CORES = float(os.getenv("SESSION_CPU_CORES", "0.25"))
+SESSION_RSS_MB = float(os.getenv("SESSION_RSS_MB", "350"))
+# Idle process pool sizing: prewarm time (logged by prewarm) and expected arrival rate
+PREWARM_SECONDS = float(os.getenv("PREWARM_SECONDS", "2"))
+SESSION_ARRIVALS_PER_MINUTE = float(os.getenv("SESSION_ARRIVALS_PER_MINUTE", "6"))
+
 
 def load_wellness_history():
     """Load previous wellness check-ins from JSON file"""
@@ -53,7 +87,8 @@ def save_wellness_entry(entry):
     history.append(entry)
     with open(WELLNESS_LOG_PATH, 'w') as f:
         json.dump(history, f, indent=2)
-    logger.info(f"Saved wellness entry: {entry}")
+    logger.info("Saved wellness entry: %s", entry["date"])
+    logger.debug("Wellness entry: %s", entry)
 
 
 def get_context_from_history():
@@ -71,6 +106,11 @@ def get_context_from_history():
     return context
 
 
+def _is_tool_success(result):
+    """Error replies are not worth caching, the next call should retry Notion"""
+    return not result.startswith("Sorry")
+
+
 class Assistant(Agent):
     def __init__(self) -> None:
         history_context = get_context_from_history()
@@ -104,8 +144,12 @@ You also have access to a Notion-based todo list system. You can:
 
 Use these tools naturally when the user mentions tasks, todos, or things they need to do.""",
         )
+        self.tool_cache = ToolCache()
+        # Check-ins saved during this session, for the session export
+        self.checkins = []
 
     @function_tool
+    @invalidates("checkin")
     async def save_checkin(
         self,
         context: RunContext,
@@ -131,6 +175,7 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
         
         # Save to local JSON
         save_wellness_entry(entry)
+        self.checkins.append(entry)
         
         # Save to Notion if configured
         if NOTION_API_TOKEN and NOTION_WELLNESS_DB_ID:
@@ -138,7 +183,7 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                 await self._save_to_notion(entry)
                 return f"Check-in saved to both local storage and Notion! Your mood: {mood}. Objectives: {objectives}"
             except Exception as e:
-                logger.error(f"Error saving to Notion: {str(e)}")
+                logger.error("Error saving to Notion: %s", e)
                 return f"Check-in saved locally! Your mood: {mood}. Objectives: {objectives}"
         
         return f"Check-in saved! Your mood: {mood}. Objectives: {objectives}"
@@ -197,13 +242,14 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                 json=page_data
             ) as response:
                 if response.status == 200:
-                    logger.info(f"Saved check-in to Notion: {entry['date']}")
+                    logger.info("Saved check-in to Notion: %s", entry["date"])
                 else:
                     error_text = await response.text()
-                    logger.error(f"Failed to save to Notion: {response.status} - {error_text}")
+                    logger.error("Failed to save to Notion: %s - %.500s", response.status, error_text)
                     raise Exception(f"Notion API error: {response.status}")
     
     @function_tool
+    @invalidates("todo")
     async def create_todo_tasks(
         self,
         context: RunContext,
@@ -262,12 +308,12 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                     ) as response:
                         if response.status == 200:
                             created_tasks.append(task_content)
-                            logger.info(f"Created Notion task: {task_content}")
+                            logger.info("Created Notion task: %s", task_content)
                         else:
                             error_text = await response.text()
-                            logger.error(f"Failed to create task: {task_content}, Status: {response.status} - {error_text}")
+                            logger.error("Failed to create task: %s, Status: %s - %.500s", task_content, response.status, error_text)
                 except Exception as e:
-                    logger.error(f"Error creating task {task_content}: {str(e)}")
+                    logger.error("Error creating task %s: %s", task_content, e)
         
         if created_tasks:
             return f"Created {len(created_tasks)} task(s) in your Notion todo list: {', '.join(created_tasks)}"
@@ -275,6 +321,7 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
             return "Sorry, I couldn't create the tasks. Please try again."
     
     @function_tool
+    @memoize(ttl=TOOL_CACHE_TTL, tags=("todo",), cacheable=_is_tool_success)
     async def get_todo_tasks(
         self,
         context: RunContext
@@ -326,13 +373,14 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                         return f"Here are your tasks:\n" + "\n".join(task_list)
                     else:
                         error_text = await response.text()
-                        logger.error(f"Failed to get tasks: {response.status} - {error_text}")
+                        logger.error("Failed to get tasks: %s - %.500s", response.status, error_text)
                         return "Sorry, I couldn't retrieve your tasks."
         except Exception as e:
-            logger.error(f"Error getting Notion tasks: {str(e)}")
+            logger.error("Error getting Notion tasks: %s", e)
             return "Sorry, I encountered an error retrieving your tasks."
     
     @function_tool
+    @invalidates("todo")
     async def complete_todo_task(
         self,
         context: RunContext,
@@ -395,17 +443,18 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                         ) as update_response:
                             if update_response.status == 200:
                                 task_title = matching_task["properties"]["Task"]["title"][0]["text"]["content"]
-                                logger.info(f"Completed Notion task: {task_title}")
+                                logger.info("Completed Notion task: %s", task_title)
                                 return f"Great! I've marked '{task_title}' as complete."
                             else:
                                 return f"Sorry, I couldn't complete the task '{task_name}'."
                     else:
                         return "Sorry, I couldn't access your todo list."
         except Exception as e:
-            logger.error(f"Error completing Notion task: {str(e)}")
+            logger.error("Error completing Notion task: %s", e)
             return "Sorry, I encountered an error completing the task."
     
     @function_tool
+    @invalidates("todo")
     async def update_todo_task(
         self,
         context: RunContext,
@@ -490,7 +539,7 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                         ) as update_response:
                             if update_response.status == 200:
                                 old_title = matching_task["properties"]["Task"]["title"][0]["text"]["content"]
-                                logger.info(f"Updated Notion task: {old_title}")
+                                logger.info("Updated Notion task: %s", old_title)
                                 
                                 update_msg = f"I've updated the task '{old_title}'"
                                 if new_task_name:
@@ -503,10 +552,11 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                     else:
                         return "Sorry, I couldn't access your todo list."
         except Exception as e:
-            logger.error(f"Error updating Notion task: {str(e)}")
+            logger.error("Error updating Notion task: %s", e)
             return "Sorry, I encountered an error updating the task."
     
     @function_tool
+    @invalidates("todo")
     async def delete_todo_task(
         self,
         context: RunContext,
@@ -563,19 +613,43 @@ Use these tools naturally when the user mentions tasks, todos, or things they ne
                         ) as delete_response:
                             if delete_response.status == 200:
                                 task_title = matching_task["properties"]["Task"]["title"][0]["text"]["content"]
-                                logger.info(f"Deleted Notion task: {task_title}")
+                                logger.info("Deleted Notion task: %s", task_title)
                                 return f"I've deleted the task '{task_title}' from your todo list."
                             else:
                                 return f"Sorry, I couldn't delete the task '{task_name}'."
                     else:
                         return "Sorry, I couldn't access your todo list."
         except Exception as e:
-            logger.error(f"Error deleting Notion task: {str(e)}")
+            logger.error("Error deleting Notion task: %s", e)
             return "Sorry, I encountered an error deleting the task."
 
 
 def prewarm(proc: JobProcess):
+    started = time.perf_counter()
     proc.userdata["vad"] = silero.VAD.load()
+    logger.info("Prewarmed process in %.2fs", time.perf_counter() - started)
+
+
+def create_sentence_tokenizer():
+    """Splits LLM output into the sentences streamed to TTS"""
+    return tokenize.basic.SentenceTokenizer(min_sentence_len=2)
+
+
+def create_session(*, stt, llm, tts, vad, turn_detection=None, **options) -> AgentSession:
+    """Voice pipeline shared by `entrypoint` and the scripts/ benchmarks"""
+    return AgentSession(
+        stt=stt,
+        llm=llm,
+        tts=tts,
+        # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
+        # See more at https://docs.livekit.io/agents/build/turns
+        turn_detection=turn_detection or MultilingualModel(),
+        vad=vad,
+        # allow the LLM to generate a response while waiting for the end of turn
+        # See more at https://docs.livekit.io/agents/build/audio/#preemptive-generation
+        preemptive_generation=True,
+        **options,
+    )
 
 
 async def entrypoint(ctx: JobContext):
@@ -586,7 +660,7 @@ async def entrypoint(ctx: JobContext):
     }
 
     # Set up a voice AI pipeline using OpenAI, Cartesia, AssemblyAI, and the LiveKit turn detector
-    session = AgentSession(
+    session = create_session(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
         stt=deepgram.STT(model="nova-3"),
@@ -600,16 +674,10 @@ async def entrypoint(ctx: JobContext):
         tts=murf.TTS(
                 voice="en-US-matthew", 
                 style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
+                tokenizer=create_sentence_tokenizer(),
                 text_pacing=True
             ),
-        # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
-        # See more at https://docs.livekit.io/agents/build/turns
-        turn_detection=MultilingualModel(),
         vad=ctx.proc.userdata["vad"],
-        # allow the LLM to generate a response while waiting for the end of turn
-        # See more at https://docs.livekit.io/agents/build/audio/#preemptive-generation
-        preemptive_generation=True,
     )
 
     # To use a realtime model instead of a voice pipeline, use the following session setup instead.
@@ -625,17 +693,55 @@ async def entrypoint(ctx: JobContext):
     # Metrics collection, to measure pipeline performance
     # For more information, see https://docs.livekit.io/agents/build/metrics/
     usage_collector = metrics.UsageCollector()
+    metrics_sampler = Sampler(every=LOG_METRICS_EVERY)
+    assistant = Assistant()
+
+    recorder = (
+        SessionRecorder(SESSION_EXPORT_DIR, session_id=ctx.job.id, room=ctx.room.name)
+        if SESSION_EXPORT_DIR
+        else None
+    )
 
     @session.on("metrics_collected")
     def _on_metrics_collected(ev: MetricsCollectedEvent):
-        metrics.log_metrics(ev.metrics)
+        # Every event still feeds the usage summary, only the per-event log is sampled.
+        # VAD metrics arrive about once a second but log_metrics has nothing to print
+        if ev.metrics.type != "vad_metrics" and metrics_sampler.should_log(ev.metrics.type):
+            metrics.log_metrics(ev.metrics, logger=logger)
         usage_collector.collect(ev.metrics)
+        if recorder:
+            recorder.add_metrics(ev.metrics)
+
+    # The worker only sees its own loop, session health is this job's loop
+    loop_lag = LoopLagMonitor()
+    loop_lag.start()
 
     async def log_usage():
+        await loop_lag.aclose()
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info(
+            "Usage: %s, tool cache: %s, loop lag: %.0fms avg / %.0fms max",
+            summary,
+            assistant.tool_cache.stats(),
+            loop_lag.lag * 1000,
+            loop_lag.max_lag * 1000,
+        )
+
+    async def export_session():
+        # Parquet encoding is CPU-bound, keep it off the event loop
+        await asyncio.to_thread(recorder.export, session.history, assistant.checkins)
 
-    ctx.add_shutdown_callback(log_usage)
+    async def finish_session():
+        # Shutdown callbacks run concurrently, so the steps that must come
+        # before the log flush are chained here
+        await log_usage()
+        if recorder:
+            await export_session()
+        if log_handler:
+            # The job process exits with os._exit, queued log lines would be lost
+            await asyncio.to_thread(log_handler.flush)
+
+    ctx.add_shutdown_callback(finish_session)
 
     # # Add a virtual avatar to the session, if desired
     # # For other providers, see https://docs.livekit.io/agents/models/avatar/
@@ -647,7 +753,7 @@ async def entrypoint(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=assistant,
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
@@ -660,4 +766,25 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
+    worker_load = WorkerLoad(
+        cpu_cores=WORKER_CPU_CORES,
+        memory_budget_mb=WORKER_MEMORY_BUDGET_MB,
+        max_loop_lag=WORKER_MAX_LOOP_LAG,
+        max_sessions=WORKER_MAX_SESSIONS,
+        session_cpu_cores=SESSION_CPU_CORES,
+        session_rss_mb=SESSION_RSS_MB,
+        load_threshold=WORKER_LOAD_THRESHOLD,
+    )
+    cli.run_app(WorkerOptions(
+        entrypoint_fnc=entrypoint,
+        prewarm_fnc=prewarm,
+        # Report load from measured per-session CPU, memory and the worker's loop lag
+        load_fnc=worker_load.get_load,
+        load_threshold=WORKER_LOAD_THRESHOLD,
+        request_fnc=worker_load.request_fnc,
+        num_idle_processes=idle_process_count(
+            PREWARM_SECONDS,
+            SESSION_ARRIVALS_PER_MINUTE,
+            worker_load.session_capacity(),
+        ),
+    ))
@@ -0,0 +1,217 @@
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional: uv sync --extra export
+    pa = ds = pq = None
+
+logger = logging.getLogger("agent")
+
+TABLES = ("messages", "tool_calls", "metrics", "checkins")
+
+# Metrics fields worth keeping for latency analysis; absent fields are null
+_METRIC_FIELDS = (
+    "duration",
+    "ttft",
+    "ttfb",
+    "audio_duration",
+    "end_of_utterance_delay",
+    "transcription_delay",
+    "on_user_turn_completed_delay",
+    "prompt_tokens",
+    "completion_tokens",
+    "characters_count",
+)
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Session export needs pyarrow, install it with `uv sync --extra export`")
+
+
+def _schemas():
+    ts = pa.timestamp("ms", tz="UTC")
+    return {
+        "messages": pa.schema([
+            ("session_id", pa.string()),
+            ("room", pa.string()),
+            ("ts", ts),
+            ("role", pa.string()),
+            ("text", pa.string()),
+            ("interrupted", pa.bool_()),
+        ]),
+        "tool_calls": pa.schema([
+            ("session_id", pa.string()),
+            ("room", pa.string()),
+            ("ts", ts),
+            ("name", pa.string()),
+            ("arguments", pa.string()),
+            ("output", pa.string()),
+            ("is_error", pa.bool_()),
+            ("latency_s", pa.float64()),
+        ]),
+        "metrics": pa.schema([
+            ("session_id", pa.string()),
+            ("ts", ts),
+            ("type", pa.string()),
+            ("label", pa.string()),
+            *((field, pa.float64()) for field in _METRIC_FIELDS),
+            ("cancelled", pa.bool_()),
+        ]),
+        "checkins": pa.schema([
+            ("session_id", pa.string()),
+            ("room", pa.string()),
+            ("ts", ts),
+            ("mood", pa.string()),
+            ("objectives", pa.list_(pa.string())),
+            ("summary", pa.string()),
+        ]),
+    }
+
+
+def _utc(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+
+class SessionRecorder:
+    """Collects one session's data and writes it as Parquet at shutdown.
+
+    Files are laid out as `<root>/<table>/date=YYYY-MM-DD/<session_id>.parquet`
+    (hive partitioning, zstd compressed), one file per table per session.
+    `scripts/session_query.py compact` merges a day's files once it is complete.
+    """
+
+    def __init__(self, root, session_id: str, room: str) -> None:
+        _require_pyarrow()
+        self.root = Path(root)
+        self.session_id = session_id
+        self.room = room
+        self.started_at = datetime.now(timezone.utc)
+        self._metrics = []
+
+    def add_metrics(self, metrics) -> None:
+        # VAD metrics arrive every second or so and carry nothing latency-related
+        if metrics.type == "vad_metrics":
+            return
+        row = {
+            "session_id": self.session_id,
+            "ts": _utc(metrics.timestamp),
+            "type": metrics.type,
+            "label": getattr(metrics, "label", None),
+            "cancelled": getattr(metrics, "cancelled", None),
+        }
+        for field in _METRIC_FIELDS:
+            value = getattr(metrics, field, None)
+            row[field] = None if value is None else float(value)
+        self._metrics.append(row)
+
+    def build_tables(self, history, checkins) -> dict:
+        """Turn the session's chat history, metrics and check-ins into Arrow tables"""
+        messages = []
+        tool_calls = []
+        pending_calls = {}
+        for item in history.items:
+            if item.type == "message":
+                text = item.text_content
+                if text:
+                    messages.append({
+                        "session_id": self.session_id,
+                        "room": self.room,
+                        "ts": _utc(item.created_at),
+                        "role": item.role,
+                        "text": text,
+                        "interrupted": item.interrupted,
+                    })
+            elif item.type == "function_call":
+                pending_calls[item.call_id] = item
+            elif item.type == "function_call_output":
+                call = pending_calls.pop(item.call_id, None)
+                tool_calls.append({
+                    "session_id": self.session_id,
+                    "room": self.room,
+                    "ts": _utc(call.created_at if call else item.created_at),
+                    "name": item.name or (call.name if call else ""),
+                    "arguments": call.arguments if call else None,
+                    "output": item.output[:1000],
+                    "is_error": item.is_error,
+                    "latency_s": item.created_at - call.created_at if call else None,
+                })
+
+        checkin_rows = [
+            {
+                "session_id": self.session_id,
+                "room": self.room,
+                "ts": datetime.fromisoformat(entry["date"]).astimezone(timezone.utc),
+                "mood": entry["mood"],
+                "objectives": entry["objectives"],
+                "summary": entry.get("summary", ""),
+            }
+            for entry in checkins
+        ]
+
+        schemas = _schemas()
+        rows = {
+            "messages": messages,
+            "tool_calls": tool_calls,
+            "metrics": self._metrics,
+            "checkins": checkin_rows,
+        }
+        return {
+            name: pa.Table.from_pylist(rows[name], schema=schemas[name])
+            for name in TABLES
+        }
+
+    def write(self, tables: dict) -> list:
+        """Write non-empty tables atomically so concurrent readers never see partial files"""
+        partition = f"date={self.started_at.date().isoformat()}"
+        written = []
+        for name, table in tables.items():
+            if table.num_rows == 0:
+                continue
+            directory = self.root / name / partition
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{self.session_id}.parquet"
+            tmp = directory / f".{self.session_id}.{uuid.uuid4().hex}.tmp"
+            pq.write_table(table, tmp, compression="zstd")
+            os.replace(tmp, path)
+            written.append(path)
+        return written
+
+    def export(self, history, checkins) -> list:
+        written = self.write(self.build_tables(history, checkins))
+        logger.info("Exported session %s to %d file(s)", self.session_id, len(written))
+        return written
+
+
+def open_dataset(root, table: str):
+    """Open one exported table across all date partitions for vectorized scans"""
+    _require_pyarrow()
+    return ds.dataset(Path(root) / table, format="parquet", partitioning="hive")
+
+
+def compact_partition(root, table: str, date: str):
+    """Merge a day's per-session files into one file, returning the new path.
+
+    Only the files present when compaction starts are removed, so sessions
+    exported meanwhile are kept.
+    """
+    _require_pyarrow()
+    directory = Path(root) / table / f"date={date}"
+    files = sorted(directory.glob("*.parquet"))
+    if len(files) < 2:
+        return None
+
+    merged = ds.dataset(files, format="parquet").to_table()
+    path = directory / f"part-{uuid.uuid4().hex}.parquet"
+    tmp = directory / f".{path.name}.tmp"
+    pq.write_table(merged, tmp, compression="zstd", row_group_size=128 * 1024)
+    os.replace(tmp, path)
+    for file in files:
+        file.unlink()
+    return path
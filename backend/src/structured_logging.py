@@ -0,0 +1,181 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed through `extra=`
+_RECORD_ATTRS = frozenset(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+# Keep a single write under PIPE_BUF so batches from several job processes
+# sharing stderr don't interleave mid-line
+_MAX_BATCH_BYTES = 4096
+
+# Argument types that can't change between the logging call and the write
+_IMMUTABLE_ARGS = (str, int, float, bool, bytes, type(None))
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One compact JSON object per record, including `extra=` fields.
+
+    Inside a job, livekit's record factory sets every `ctx.log_context_fields`
+    key on the record, so those fields come through the same way.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(payload, default=str, separators=(",", ":"))
+
+
+class BackgroundLogHandler(logging.Handler):
+    """Queue records and format/write them in batches on a background thread.
+
+    Unlike `QueueHandler`, records are enqueued unformatted, so message
+    formatting and JSON encoding stay off the event loop. Records with mutable
+    arguments (dicts, dataclasses, ...) are the exception: their message is
+    rendered in `emit`, otherwise a later mutation would change what is logged.
+    """
+
+    def __init__(self, stream=None, max_batch: int = 256, flush_interval: float = 0.5) -> None:
+        super().__init__()
+        self._stream = stream or sys.stderr
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self.setFormatter(JsonLinesFormatter())
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # Job processes may be forked from a parent that already started the thread
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self._freeze(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self._queue.put(record)
+
+    @staticmethod
+    def _freeze(record: logging.LogRecord) -> None:
+        args = record.args
+        if not args:
+            return
+        # A lone dict argument becomes `record.args` itself, which is mutable too
+        is_mapping = isinstance(args, dict)
+        values = args.values() if is_mapping else args
+        if all(isinstance(value, _IMMUTABLE_ARGS) for value in values):
+            if is_mapping:
+                record.args = dict(args)
+            return
+        record.msg = record.getMessage()
+        record.args = None
+
+    def _start(self) -> None:
+        self._pid = os.getpid()
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        batch = []
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if batch else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                self._write(batch)
+                batch = []
+                continue
+            if isinstance(item, logging.LogRecord):
+                if not batch:
+                    deadline = time.monotonic() + self._flush_interval
+                batch.append(item)
+                if len(batch) >= self._max_batch:
+                    self._write(batch)
+                    batch = []
+                continue
+            # `close` (None) or a `flush` marker: write everything queued before it
+            if batch:
+                self._write(batch)
+                batch = []
+            if item is None:
+                return
+            item.set()
+
+    def _write(self, batch) -> None:
+        chunk = []
+        size = 0
+        for record in batch:
+            try:
+                line = self.format(record) + "\n"
+            except Exception:
+                self.handleError(record)
+                continue
+            if chunk and size + len(line) > _MAX_BATCH_BYTES:
+                self._stream.write("".join(chunk))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += len(line)
+        if chunk:
+            self._stream.write("".join(chunk))
+        self._stream.flush()
+
+    def flush(self, timeout: float = 2.0) -> None:
+        """Block until every record queued so far has been written.
+
+        Job processes exit through `os._exit`, so `logging.shutdown` never
+        runs there and anything still queued is lost unless this is called.
+        """
+        if self._thread is None or self._pid != os.getpid():
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        written.wait(timeout)
+
+    def close(self) -> None:
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.put(None)
+            self._thread.join(timeout=2)
+            self._thread = None
+        super().close()
+
+
+class Sampler:
+    """Let through every `every`-th event per key, starting with the first."""
+
+    def __init__(self, every: int = 1) -> None:
+        self._every = max(1, every)
+        self._counts = {}
+
+    def should_log(self, key) -> bool:
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self._every == 0
+
+
+def setup_structured_logging(logger: logging.Logger, level=None) -> BackgroundLogHandler:
+    """Route `logger` through a batched JSON handler instead of the root handlers."""
+    handler = BackgroundLogHandler()
+    logger.addHandler(handler)
+    logger.propagate = False
+    if level is not None:
+        logger.setLevel(level)
+    return handler
@@ -0,0 +1,115 @@
+import functools
+import inspect
+import logging
+import time
+
+logger = logging.getLogger("agent")
+
+
+class ToolCache:
+    """Per-session memoization of function tool results.
+
+    Entries are keyed by tool name and call arguments and expire after a short TTL.
+    Each entry belongs to one or more tags; mutating tools invalidate a tag to drop
+    every entry that may now be stale.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = {}
+        self._generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generation(self, tags):
+        return tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, _tags, value = entry
+            if self._clock() < expires_at:
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key, value, ttl, tags, generation=None):
+        # Skip the store if a write invalidated these tags while the read was in flight
+        if generation is not None and generation != self.generation(tags):
+            return
+        self._entries[key] = (self._clock() + ttl, tuple(tags), value)
+
+    def invalidate(self, *tags):
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        stale = [key for key, (_, entry_tags, _) in self._entries.items() if set(entry_tags) & set(tags)]
+        for key in stale:
+            del self._entries[key]
+        self.invalidations += len(stale)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
+
+
+def _call_key(func, args, kwargs):
+    # args[0] is the agent and args[1] the RunContext; neither belongs in the key
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = tuple(
+        (name, value) for name, value in list(bound.arguments.items())[2:]
+    )
+    return (func.__name__, params)
+
+
+def memoize(ttl, tags, cacheable=None):
+    """Cache a tool's result on the agent's `tool_cache` for `ttl` seconds.
+
+    Apply below `@function_tool` so the tool schema is still built from the
+    original signature. `cacheable` can reject results (e.g. error messages)
+    that should not be served again.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache = args[0].tool_cache
+            key = _call_key(func, args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                logger.debug("Tool cache hit: %s", func.__name__)
+                return value
+
+            generation = cache.generation(tags)
+            result = await func(*args, **kwargs)
+            if cacheable is None or cacheable(result):
+                cache.put(key, result, ttl, tags, generation)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def invalidates(*tags):
+    """Drop cached results for `tags` once the decorated mutating tool has run."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                # Invalidate even on failure, a partial write may still have landed
+                args[0].tool_cache.invalidate(*tags)
+
+        return wrapper
+
+    return decorator
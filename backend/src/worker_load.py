@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import logging
+import math
+import os
+import threading
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+import psutil
+
+logger = logging.getLogger("agent")
+
+# Inside a container this is the container's own cgroup (cgroup namespaces)
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read_cgroup(*names):
+    """First readable cgroup file of `names`, v2 names listed before v1"""
+    for name in names:
+        try:
+            return (CGROUP_ROOT / name).read_text().strip()
+        except OSError:
+            continue
+    return None
+
+
+def _cgroup_cpu_limit():
+    """Cores allowed by the cgroup CPU quota, None when there is no quota"""
+    cpu_max = _read_cgroup("cpu.max")
+    if cpu_max is not None:
+        quota, period = cpu_max.split()
+        return None if quota == "max" else int(quota) / int(period)
+    quota = _read_cgroup("cpu/cpu.cfs_quota_us", "cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_cgroup("cpu/cpu.cfs_period_us", "cpu,cpuacct/cpu.cfs_period_us")
+    if quota is None or period is None or int(quota) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def _cgroup_memory_limit():
+    """Bytes allowed by the cgroup memory limit, None when unlimited"""
+    limit = _read_cgroup("memory.max", "memory/memory.limit_in_bytes")
+    if limit is None or limit == "max":
+        return None
+    # cgroup v1 reports "unlimited" as a huge page-aligned number
+    return int(limit) if int(limit) < 2**60 else None
+
+
+def cpu_limit() -> float:
+    """Cores this process may use: CPU affinity capped by any cgroup quota"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    quota = _cgroup_cpu_limit()
+    return min(cores, quota) if quota else float(cores)
+
+
+def available_cpus():
+    """Whole CPUs this process may run on (respects affinity and cgroup quotas)"""
+    return max(1, math.ceil(cpu_limit()))
+
+
+def memory_limit_mb() -> float:
+    """Physical memory capped by any cgroup (container) memory limit"""
+    total = psutil.virtual_memory().total
+    limit = _cgroup_memory_limit()
+    return min(total, limit or total) / (1024 * 1024)
+
+
+class LoopLagMonitor:
+    """Measure how late the event loop wakes up from a fixed-interval sleep."""
+
+    def __init__(
+        self, interval: float = 0.25, smoothing: float = 0.2, keep_samples: bool = False
+    ) -> None:
+        self._interval = interval
+        self._smoothing = smoothing
+        self._task = None
+        self.lag = 0.0
+        self.max_lag = 0.0
+        # Raw samples are only kept for benchmarks, a worker runs indefinitely
+        self.samples = [] if keep_samples else None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def record(self, lag: float) -> None:
+        lag = max(lag, 0.0)
+        self.lag += self._smoothing * (lag - self.lag)
+        self.max_lag = max(self.max_lag, lag)
+        if self.samples is not None:
+            self.samples.append(lag)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self._interval)
+            self.record(loop.time() - started - self._interval)
+
+
+@dataclass
+class LoadSnapshot:
+    active_sessions: int
+    cpu_cores: float
+    rss_mb: float
+    loop_lag: float
+    session_cpu_cores: float
+    session_rss_mb: float
+
+
+class WorkerLoad:
+    """Load reporting and job admission for the agent worker.
+
+    The worker process and every child (job processes, the turn-detector
+    inference process) are sampled together, so BVC, turn detection and
+    in-flight Notion I/O show up in the measured per-session CPU and memory.
+    Load is the highest of CPU, memory, event-loop lag and session-slot usage,
+    each as a fraction of its budget.
+
+    Loop lag is measured on the worker's own (supervisor) loop, which only
+    handles the LiveKit connection and job IPC; sessions run on their own
+    loops in the job processes, which `entrypoint` measures and logs per job.
+    A lagging supervisor still can't hand out jobs reliably, so it counts
+    towards load.
+
+    `get_load` runs in an executor thread while `request_fnc` runs on the
+    worker's loop. Process-tree walks are serialized by their own lock and
+    never run on the loop; the loop only takes the short lock around the cost
+    averages and the last snapshot.
+    """
+
+    def __init__(
+        self,
+        cpu_cores: float = 0.0,
+        cpu_budget: float = 0.8,
+        memory_budget_mb: float = 0.0,
+        max_loop_lag: float = 0.1,
+        max_sessions: int = 0,
+        session_cpu_cores: float = 0.25,
+        session_rss_mb: float = 350.0,
+        load_threshold: float = 0.75,
+        smoothing: float = 0.2,
+    ) -> None:
+        # Cores and memory default to the container's limits, not the host's
+        self.cpus = cpu_cores or cpu_limit()
+        self.cpu_capacity = self.cpus * cpu_budget
+        self.memory_budget_mb = memory_budget_mb or memory_limit_mb() * 0.8
+        self.max_loop_lag = max_loop_lag
+        self.max_sessions = max_sessions
+        self.load_threshold = load_threshold
+        self.loop_lag = LoopLagMonitor()
+        self._lock = threading.Lock()
+        self._sample_lock = threading.Lock()
+        self._worker = None
+        self._smoothing = smoothing
+        # Per-session costs start from configured estimates and converge on measurements
+        self._session_cpu = session_cpu_cores
+        self._session_rss = session_rss_mb
+        self._idle_cpu = 0.0
+        self._idle_rss = None
+        self._procs = {}
+        self.last = None
+
+    def _sample_tree(self):
+        root = psutil.Process()
+        procs = [root, *root.children(recursive=True)]
+        cpu_percent = 0.0
+        rss = 0
+        alive = {}
+        for proc in procs:
+            # Reuse Process objects so cpu_percent() measures since the previous sample
+            proc = self._procs.get(proc.pid, proc)
+            try:
+                cpu_percent += proc.cpu_percent(interval=None)
+                rss += proc.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+            alive[proc.pid] = proc
+        self._procs = alive
+        return cpu_percent / 100, rss / (1024 * 1024)
+
+    def _update_costs(self, active: int, cpu_cores: float, rss_mb: float) -> None:
+        alpha = self._smoothing
+        if active == 0:
+            self._idle_cpu += alpha * (cpu_cores - self._idle_cpu)
+            if self._idle_rss is None:
+                self._idle_rss = rss_mb
+            else:
+                self._idle_rss += alpha * (rss_mb - self._idle_rss)
+            return
+
+        per_cpu = max(cpu_cores - self._idle_cpu, 0.0) / active
+        self._session_cpu += alpha * (per_cpu - self._session_cpu)
+        if self._idle_rss is not None:
+            per_rss = max(rss_mb - self._idle_rss, 0.0) / active
+            self._session_rss += alpha * (per_rss - self._session_rss)
+
+    def session_capacity(self) -> int:
+        """Sessions that fit in the CPU and memory budgets at the measured per-session cost"""
+        by_cpu = (self.cpu_capacity - self._idle_cpu) / max(self._session_cpu, 0.01)
+        by_mem = (self.memory_budget_mb - (self._idle_rss or 0.0)) / max(self._session_rss, 1.0)
+        capacity = max(1, math.floor(min(by_cpu, by_mem)))
+        if self.max_sessions:
+            capacity = min(capacity, self.max_sessions)
+        return capacity
+
+    def compute_load(self, snapshot: LoadSnapshot) -> float:
+        return min(
+            1.0,
+            max(
+                snapshot.active_sessions / self.session_capacity(),
+                snapshot.cpu_cores / self.cpu_capacity,
+                snapshot.rss_mb / self.memory_budget_mb,
+                snapshot.loop_lag / self.max_loop_lag,
+            ),
+        )
+
+    def sample(self, active_sessions: int) -> LoadSnapshot:
+        """Walk the process tree (blocking, keep it off the event loop)"""
+        with self._sample_lock:
+            cpu_cores, rss_mb = self._sample_tree()
+            with self._lock:
+                self._update_costs(active_sessions, cpu_cores, rss_mb)
+                self.last = LoadSnapshot(
+                    active_sessions=active_sessions,
+                    cpu_cores=cpu_cores,
+                    rss_mb=rss_mb,
+                    loop_lag=self.loop_lag.lag,
+                    session_cpu_cores=self._session_cpu,
+                    session_rss_mb=self._session_rss,
+                )
+                return self.last
+
+    def get_load(self, worker) -> float:
+        """`WorkerOptions.load_fnc`: called periodically by the worker"""
+        self._worker = worker
+        snapshot = self.sample(len(worker.active_jobs))
+        load = self.compute_load(snapshot)
+        logger.debug("Worker load: %.2f (%s)", load, snapshot)
+        return load
+
+    def should_accept(self, snapshot: LoadSnapshot) -> bool:
+        """Admit a job only if one more session still fits under the threshold"""
+        if snapshot.loop_lag >= self.max_loop_lag:
+            return False
+        projected = LoadSnapshot(
+            active_sessions=snapshot.active_sessions + 1,
+            cpu_cores=snapshot.cpu_cores + snapshot.session_cpu_cores,
+            rss_mb=snapshot.rss_mb + snapshot.session_rss_mb,
+            loop_lag=snapshot.loop_lag,
+            session_cpu_cores=snapshot.session_cpu_cores,
+            session_rss_mb=snapshot.session_rss_mb,
+        )
+        return self.compute_load(projected) <= self.load_threshold
+
+    async def request_fnc(self, req) -> None:
+        """`WorkerOptions.request_fnc`: runs on the worker's event loop"""
+        # The first request is our first chance to hook the worker's loop
+        self.loop_lag.start()
+        if self.last is None:
+            active = len(self._worker.active_jobs) if self._worker else 0
+            await asyncio.get_running_loop().run_in_executor(None, self.sample, active)
+        # Load is only reported every few seconds; re-check so a burst can't overfill us
+        with self._lock:
+            snapshot = self.last
+            accept = self.should_accept(snapshot)
+            if accept:
+                # Reserve the new session until the next periodic sample sees it.
+                # Replace rather than mutate, the old snapshot may still be queued for logging
+                self.last = replace(
+                    snapshot,
+                    active_sessions=snapshot.active_sessions + 1,
+                    cpu_cores=snapshot.cpu_cores + snapshot.session_cpu_cores,
+                    rss_mb=snapshot.rss_mb + snapshot.session_rss_mb,
+                )
+        if accept:
+            await req.accept()
+        else:
+            logger.warning("Rejecting job %s: worker at capacity (%s)", req.id, snapshot)
+            await req.reject()
+
+
+def idle_process_count(
+    prewarm_seconds: float,
+    arrivals_per_minute: float,
+    max_sessions: int,
+) -> int:
+    """Idle processes needed to absorb the sessions arriving while one prewarms.
+
+    Each idle process holds a loaded VAD, so keeping more than that wastes
+    memory that active sessions could use.
+    """
+    burst = math.ceil(arrivals_per_minute / 60 * prewarm_seconds) + 1
+    return max(1, min(burst, max_sessions, available_cpus()))
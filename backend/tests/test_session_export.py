@@ -0,0 +1,107 @@
+import time
+
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from livekit.agents import llm
+from livekit.agents.metrics import LLMMetrics, VADMetrics
+
+from session_export import SessionRecorder, compact_partition, open_dataset
+
+
+def _history() -> llm.ChatContext:
+    now = time.time()
+    history = llm.ChatContext()
+    history.add_message(role="user", content="What do I need to do today?", created_at=now)
+    history.items.append(
+        llm.FunctionCall(call_id="1", name="get_todo_tasks", arguments="{}", created_at=now + 1)
+    )
+    history.items.append(
+        llm.FunctionCallOutput(
+            call_id="1",
+            name="get_todo_tasks",
+            output="Here are your tasks:\n- exercise (Not started)",
+            is_error=False,
+            created_at=now + 1.25,
+        )
+    )
+    history.add_message(role="assistant", content="You still need to exercise.", created_at=now + 2)
+    return history
+
+
+def _llm_metrics() -> LLMMetrics:
+    return LLMMetrics(
+        label="fake",
+        request_id="r1",
+        timestamp=time.time(),
+        duration=0.8,
+        ttft=0.3,
+        cancelled=False,
+        completion_tokens=10,
+        prompt_tokens=100,
+        prompt_cached_tokens=0,
+        total_tokens=110,
+        tokens_per_second=12.5,
+    )
+
+
+def _checkin() -> dict:
+    return {
+        "date": "2025-01-31T09:00:00",
+        "mood": "Calm",
+        "objectives": ["exercise", "read"],
+        "summary": "",
+    }
+
+
+def test_export_writes_partitioned_tables(tmp_path) -> None:
+    recorder = SessionRecorder(tmp_path, session_id="AJ_1", room="room-1")
+    recorder.add_metrics(_llm_metrics())
+    recorder.add_metrics(
+        VADMetrics(
+            label="vad",
+            timestamp=time.time(),
+            idle_time=0.0,
+            inference_duration_total=0.1,
+            inference_count=10,
+        )
+    )
+
+    written = recorder.export(_history(), [_checkin()])
+
+    assert len(written) == 4
+    assert all(path.parent.name.startswith("date=") for path in written)
+
+    messages = open_dataset(tmp_path, "messages").to_table()
+    assert messages["role"].to_pylist() == ["user", "assistant"]
+
+    tools = open_dataset(tmp_path, "tool_calls").to_table()
+    assert tools["name"].to_pylist() == ["get_todo_tasks"]
+    assert tools["latency_s"][0].as_py() == pytest.approx(0.25)
+
+    metrics = open_dataset(tmp_path, "metrics").to_table()
+    assert metrics["type"].to_pylist() == ["llm_metrics"]
+    assert metrics["ttft"][0].as_py() == pytest.approx(0.3)
+
+    checkins = open_dataset(tmp_path, "checkins").to_table()
+    assert checkins["objectives"].to_pylist() == [["exercise", "read"]]
+
+
+def test_empty_tables_are_not_written(tmp_path) -> None:
+    recorder = SessionRecorder(tmp_path, session_id="AJ_2", room="room-2")
+
+    written = recorder.export(llm.ChatContext(), [])
+
+    assert written == []
+
+
+def test_compact_merges_a_day_into_one_file(tmp_path) -> None:
+    for i in range(3):
+        SessionRecorder(tmp_path, session_id=f"AJ_{i}", room="room").export(_history(), [])
+    date = next((tmp_path / "messages").iterdir()).name.split("=", 1)[1]
+
+    merged = compact_partition(tmp_path, "messages", date)
+
+    assert list(merged.parent.glob("*.parquet")) == [merged]
+    assert open_dataset(tmp_path, "messages").count_rows() == 6
@@ -0,0 +1,106 @@
+import io
+import json
+import logging
+import multiprocessing
+import sys
+
+import pytest
+
+from structured_logging import BackgroundLogHandler, Sampler
+
+
+def _logger(name: str, stream: io.StringIO) -> tuple[logging.Logger, BackgroundLogHandler]:
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = BackgroundLogHandler(stream=stream, flush_interval=0.01)
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def test_records_are_written_as_json_lines_with_session_fields() -> None:
+    stream = io.StringIO()
+    logger, handler = _logger("test.structured", stream)
+
+    # Same as livekit's JobContext: log_context_fields are set on every record
+    old_factory = logging.getLogRecordFactory()
+
+    def record_factory(*args, **kwargs):
+        record = old_factory(*args, **kwargs)
+        record.room = "room-1"
+        return record
+
+    logging.setLogRecordFactory(record_factory)
+    try:
+        logger.info("Created Notion task: %s", "exercise", extra={"status": 200})
+    finally:
+        logging.setLogRecordFactory(old_factory)
+    handler.close()
+    logger.removeHandler(handler)
+
+    line = stream.getvalue().splitlines()[0]
+    record = json.loads(line)
+    assert record["msg"] == "Created Notion task: exercise"
+    assert record["level"] == "INFO"
+    assert record["status"] == 200
+    assert record["room"] == "room-1"
+    assert line.count('"room"') == 1
+
+
+def test_mutable_arguments_are_logged_as_they_were_at_call_time() -> None:
+    stream = io.StringIO()
+    logger, handler = _logger("test.structured.frozen", stream)
+
+    entry = {"mood": "calm"}
+    logger.info("Saved entry %s", entry)
+    entry["mood"] = "tired"
+    handler.close()
+    logger.removeHandler(handler)
+
+    assert json.loads(stream.getvalue())["msg"] == "Saved entry {'mood': 'calm'}"
+
+
+def test_close_flushes_every_queued_record() -> None:
+    stream = io.StringIO()
+    logger, handler = _logger("test.structured.batch", stream)
+
+    for i in range(500):
+        logger.info("event %d", i)
+    handler.close()
+    logger.removeHandler(handler)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 500
+    assert json.loads(lines[-1])["msg"] == "event 499"
+
+
+def _log_in_child(path: str) -> None:
+    with open(path, "w") as stream:
+        logger, handler = _logger("test.structured.child", stream)
+        # Long enough that the record would still be queued at exit without flush()
+        handler._flush_interval = 30
+        logger.info("Usage: %s", "summary")
+        handler.flush()
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="forkserver is POSIX only")
+def test_flush_writes_queued_records_before_a_forkserver_child_exits(tmp_path) -> None:
+    # livekit runs jobs in forkserver children, which exit without logging.shutdown
+    path = tmp_path / "child.log"
+    process = multiprocessing.get_context("forkserver").Process(
+        target=_log_in_child, args=(str(path),)
+    )
+    process.start()
+    process.join(timeout=30)
+
+    assert process.exitcode == 0
+    assert json.loads(path.read_text())["msg"] == "Usage: summary"
+
+
+def test_sampler_keeps_every_nth_event_per_key() -> None:
+    sampler = Sampler(every=3)
+
+    kept = [sampler.should_log("LLMMetrics") for _ in range(7)]
+
+    assert kept == [True, False, False, True, False, False, True]
+    assert sampler.should_log("TTSMetrics")
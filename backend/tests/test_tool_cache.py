@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+from tool_cache import ToolCache, invalidates, memoize
+
+
+class _FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _Tools:
+    def __init__(self, clock=None) -> None:
+        self.tool_cache = ToolCache(clock=clock) if clock else ToolCache()
+        self.reads = 0
+
+    @memoize(ttl=30, tags=("todo",), cacheable=lambda r: not r.startswith("Sorry"))
+    async def get_tasks(self, context, status: str = "open"):
+        self.reads += 1
+        if status == "broken":
+            return "Sorry, failed"
+        return f"{status} tasks #{self.reads}"
+
+    @invalidates("todo")
+    async def add_task(self, context, name: str):
+        return f"added {name}"
+
+
+@pytest.mark.asyncio
+async def test_repeated_reads_hit_cache() -> None:
+    tools = _Tools()
+
+    first = await tools.get_tasks(None)
+    second = await tools.get_tasks(None, status="open")
+
+    assert first == second
+    assert tools.reads == 1
+    assert tools.tool_cache.stats()["hits"] == 1
+    assert tools.tool_cache.stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_arguments_are_part_of_the_key() -> None:
+    tools = _Tools()
+
+    await tools.get_tasks(None, "open")
+    await tools.get_tasks(None, "done")
+
+    assert tools.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_after_ttl() -> None:
+    clock = _FakeClock()
+    tools = _Tools(clock=clock)
+
+    await tools.get_tasks(None)
+    clock.now = 31
+    await tools.get_tasks(None)
+
+    assert tools.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_mutation_invalidates_reads() -> None:
+    tools = _Tools()
+
+    await tools.get_tasks(None)
+    await tools.add_task(None, "exercise")
+    await tools.get_tasks(None)
+
+    assert tools.reads == 2
+    assert tools.tool_cache.stats()["invalidations"] == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached() -> None:
+    tools = _Tools()
+
+    await tools.get_tasks(None, "broken")
+    await tools.get_tasks(None, "broken")
+
+    assert tools.reads == 2
+
+
+@pytest.mark.asyncio
+async def test_read_racing_a_write_is_not_stored() -> None:
+    tools = _Tools()
+    release = asyncio.Event()
+
+    @memoize(ttl=30, tags=("todo",))
+    async def slow_read(self, context):
+        await release.wait()
+        return "stale"
+
+    read = asyncio.create_task(slow_read(tools, None))
+    await asyncio.sleep(0)
+    await tools.add_task(None, "exercise")
+    release.set()
+    await read
+
+    assert tools.tool_cache.stats()["entries"] == 0
@@ -0,0 +1,187 @@
+import asyncio
+import types
+
+import pytest
+
+import worker_load
+from worker_load import LoadSnapshot, LoopLagMonitor, WorkerLoad, idle_process_count
+
+
+def _worker_load(**kwargs) -> WorkerLoad:
+    return WorkerLoad(cpu_cores=4, cpu_budget=1.0, memory_budget_mb=4000, **kwargs)
+
+
+def _snapshot(active: int, cpu: float = 0.0, rss: float = 0.0, lag: float = 0.0) -> LoadSnapshot:
+    return LoadSnapshot(
+        active_sessions=active,
+        cpu_cores=cpu,
+        rss_mb=rss,
+        loop_lag=lag,
+        session_cpu_cores=0.5,
+        session_rss_mb=400,
+    )
+
+
+def test_load_is_highest_budget_fraction() -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400)
+
+    assert load.session_capacity() == 8
+    assert load.compute_load(_snapshot(2, cpu=1.0, rss=800)) == pytest.approx(0.25)
+    assert load.compute_load(_snapshot(2, cpu=3.0, rss=800)) == pytest.approx(0.75)
+    assert load.compute_load(_snapshot(2, lag=0.05)) == pytest.approx(0.5)
+
+
+def test_per_session_cost_tracks_measurements() -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400, smoothing=1.0)
+
+    load._update_costs(0, 0.2, 500)
+    load._update_costs(2, 2.2, 1500)
+
+    assert load._session_cpu == pytest.approx(1.0)
+    assert load._session_rss == pytest.approx(500)
+    assert load.session_capacity() == 3
+
+
+def test_admission_rejects_when_next_session_exceeds_threshold() -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400, load_threshold=0.75)
+
+    assert load.should_accept(_snapshot(4, cpu=2.0, rss=1600))
+    assert not load.should_accept(_snapshot(6, cpu=3.0, rss=2400))
+    assert not load.should_accept(_snapshot(0, lag=0.2))
+
+
+class _Request:
+    id = "job-1"
+
+    def __init__(self) -> None:
+        self.accepted = None
+
+    async def accept(self) -> None:
+        self.accepted = True
+
+    async def reject(self) -> None:
+        self.accepted = False
+
+
+def test_request_reserves_a_session_without_mutating_the_logged_snapshot() -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400)
+    logged = load.last = _snapshot(1, cpu=0.5, rss=400)
+    req = _Request()
+
+    async def run() -> None:
+        await load.request_fnc(req)
+        await load.loop_lag.aclose()
+
+    asyncio.run(run())
+
+    assert req.accepted
+    assert logged.active_sessions == 1
+    assert load.last.active_sessions == 2
+    assert load.last.cpu_cores == pytest.approx(1.0)
+
+
+def test_request_does_not_wait_for_a_process_tree_walk() -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400)
+    load.last = _snapshot(1, cpu=0.5, rss=400)
+    req = _Request()
+
+    async def run() -> None:
+        # get_load is mid-walk in its executor thread
+        with load._sample_lock:
+            await asyncio.wait_for(load.request_fnc(req), timeout=1)
+        await load.loop_lag.aclose()
+
+    asyncio.run(run())
+
+    assert req.accepted
+
+
+def test_first_request_samples_the_worker_active_jobs(monkeypatch) -> None:
+    load = _worker_load(session_cpu_cores=0.5, session_rss_mb=400)
+    monkeypatch.setattr(load, "_sample_tree", lambda: (0.0, 0.0))
+    load._worker = types.SimpleNamespace(active_jobs=[object(), object()])
+
+    async def run() -> None:
+        await load.request_fnc(_Request())
+        await load.loop_lag.aclose()
+
+    asyncio.run(run())
+
+    assert load.last.active_sessions == 3
+
+
+def test_max_sessions_caps_capacity() -> None:
+    load = _worker_load(max_sessions=2)
+
+    assert load.session_capacity() == 2
+
+
+def test_loop_lag_monitor_smooths_samples() -> None:
+    monitor = LoopLagMonitor(smoothing=0.5, keep_samples=True)
+
+    monitor.record(0.1)
+    monitor.record(-0.01)
+
+    assert monitor.lag == pytest.approx(0.025)
+    assert monitor.max_lag == pytest.approx(0.1)
+    assert monitor.samples == [0.1, 0.0]
+
+
+def _cgroup(monkeypatch, tmp_path, files: dict) -> None:
+    for name, value in files.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(value + "\n")
+    monkeypatch.setattr(worker_load, "CGROUP_ROOT", tmp_path)
+    monkeypatch.setattr(worker_load.os, "sched_getaffinity", lambda pid: set(range(16)), raising=False)
+
+
+def test_cgroup_v2_limits_cap_cpu_and_memory(monkeypatch, tmp_path) -> None:
+    _cgroup(monkeypatch, tmp_path, {"cpu.max": "150000 100000", "memory.max": str(2048 * 1024 * 1024)})
+
+    load = WorkerLoad()
+
+    assert load.cpus == pytest.approx(1.5)
+    assert load.memory_budget_mb == pytest.approx(2048 * 0.8)
+    assert worker_load.available_cpus() == 2
+
+
+def test_cgroup_v1_limits_cap_cpu_and_memory(monkeypatch, tmp_path) -> None:
+    _cgroup(monkeypatch, tmp_path, {
+        "cpu/cpu.cfs_quota_us": "200000",
+        "cpu/cpu.cfs_period_us": "100000",
+        "memory/memory.limit_in_bytes": str(1024 * 1024 * 1024),
+    })
+
+    assert worker_load.cpu_limit() == pytest.approx(2.0)
+    assert worker_load.memory_limit_mb() == pytest.approx(1024)
+
+
+def test_unlimited_cgroup_falls_back_to_affinity_and_host_memory(monkeypatch, tmp_path) -> None:
+    _cgroup(monkeypatch, tmp_path, {
+        "cpu/cpu.cfs_quota_us": "-1",
+        "cpu/cpu.cfs_period_us": "100000",
+        "memory/memory.limit_in_bytes": "9223372036854771712",
+    })
+
+    assert worker_load.cpu_limit() == 16
+    assert worker_load.memory_limit_mb() == pytest.approx(
+        worker_load.psutil.virtual_memory().total / (1024 * 1024)
+    )
+
+
+def test_configured_cores_and_memory_override_cgroup_limits(monkeypatch, tmp_path) -> None:
+    _cgroup(monkeypatch, tmp_path, {"cpu.max": "max 100000", "memory.max": "max"})
+
+    load = WorkerLoad(cpu_cores=3, cpu_budget=0.5, memory_budget_mb=1000)
+
+    assert load.cpu_capacity == pytest.approx(1.5)
+    assert load.memory_budget_mb == 1000
+
+
+def test_idle_pool_covers_arrivals_during_prewarm(monkeypatch) -> None:
+    monkeypatch.setattr(worker_load, "available_cpus", lambda: 8)
+
+    assert idle_process_count(prewarm_seconds=2, arrivals_per_minute=60, max_sessions=100) == 3
+    assert idle_process_count(prewarm_seconds=2, arrivals_per_minute=600, max_sessions=2) == 2
+    assert idle_process_count(prewarm_seconds=0, arrivals_per_minute=0, max_sessions=10) == 1